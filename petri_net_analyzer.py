@@ -6,37 +6,85 @@ This module implements:
 1. PNML parsing
 2. Explicit reachability computation (BFS)
 3. Symbolic reachability using BDD
-4. Deadlock detection using ILP + BDD
+4. Deadlock detection using ILP with a reachability oracle
 5. Optimization over reachable markings
 
 Libraries used:
-- xml.etree.ElementTree: For PNML parsing
+- xml.parsers.expat: For streaming PNML parsing
 - dd (BDD library with CUDD backend): For symbolic reachability
 - pulp: For ILP formulations
 """
 
-import xml.etree.ElementTree as ET
-from collections import deque
-from typing import Dict, List, Tuple, Set, Optional
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from functools import lru_cache, partial
+from math import gcd
+from typing import Callable, Dict, List, NamedTuple, Tuple, Set, Optional
+from xml.parsers import expat
+import operator
+import os
 import time
 import sys
+import warnings
 
+# Prefer the CUDD-backed bindings; the pure-Python autoref module has the
+# same API and is used when dd was installed without CUDD
 try:
-    from dd import autoref as _bdd
+    from dd import cudd as _bdd
     BDD_AVAILABLE = True
+    BDD_BACKEND = "cudd"
 except ImportError:
-    print("Warning: dd library not found. Install with: pip install dd")
-    BDD_AVAILABLE = False
-    _bdd = None
+    try:
+        from dd import autoref as _bdd
+        BDD_AVAILABLE = True
+        BDD_BACKEND = "autoref"
+    except ImportError:
+        BDD_AVAILABLE = False
+        BDD_BACKEND = None
+        _bdd = None
 
 try:
     import pulp
     ILP_AVAILABLE = True
 except ImportError:
-    print("Warning: pulp library not found. Install with: pip install pulp")
     ILP_AVAILABLE = False
     pulp = None
 
+# Namespace-qualified element names as reported by expat, which joins the
+# namespace URI and the local name with NS_SEPARATOR
+NS_SEPARATOR = " "
+PNML_NS = "http://www.pnml.org/version-2009/grammar/ptnet" + NS_SEPARATOR
+TAG_NET = PNML_NS + "net"
+TAG_PLACE = PNML_NS + "place"
+TAG_TRANSITION = PNML_NS + "transition"
+TAG_ARC = PNML_NS + "arc"
+TAG_NAME = PNML_NS + "name"
+TAG_INITIAL_MARKING = PNML_NS + "initialMarking"
+TAG_INSCRIPTION = PNML_NS + "inscription"
+TAG_TEXT = PNML_NS + "text"
+_NODE_TAGS = frozenset((TAG_PLACE, TAG_TRANSITION, TAG_ARC))
+_TEXT_FIELDS = frozenset((TAG_NAME, TAG_INITIAL_MARKING, TAG_INSCRIPTION))
+
+# Node kinds stored in PetriNet.node_kinds (NODE_UNKNOWN marks an ID that is
+# neither a place nor a transition)
+NODE_UNKNOWN = 0
+NODE_PLACE = 1
+NODE_TRANSITION = 2
+# XOR of the endpoint kinds of a valid (place <-> transition) arc
+_VALID_ARC_KINDS = NODE_PLACE ^ NODE_TRANSITION
+
+# Consistency errors are collected as (code, node or arc id, detail) tuples
+# and only formatted with these templates when they are reported
+ERROR_FORMATS = {
+    "duplicate_place": "Duplicate place ID '{0}'",
+    "duplicate_transition": "Duplicate transition ID '{0}'",
+    "bad_source": "Arc {0}: invalid source '{1}'",
+    "bad_target": "Arc {0}: invalid target '{1}'",
+    "place_to_place": "Arc {0}: connects place to place (invalid)",
+    "transition_to_transition": "Arc {0}: connects transition to transition (invalid)",
+}
+
 
 class PetriNet:
     """Represents a 1-safe Petri net."""
@@ -44,82 +92,151 @@ class PetriNet:
     def __init__(self):
         self.places: Dict[str, 'Place'] = {}
         self.transitions: Dict[str, 'Transition'] = {}
-        self.arcs: List['Arc'] = []
+        
+        # Arcs stored as parallel arrays (one entry per arc, same index in
+        # each); endpoints are node indices (see node_ids) in C int arrays
+        self.arc_ids: List[str] = []
+        self.arc_sources = array('i')
+        self.arc_targets = array('i')
+        self.arc_weights: List[int] = []
         
         # Internal representation for efficient computation
         self.place_ids: List[str] = []  # Ordered list of place IDs
         self.transition_ids: List[str] = []  # Ordered list of transition IDs
         self.place_to_index: Dict[str, int] = {}  # Map place ID to index
         
-        # Pre and post matrices: pre[t][p] = tokens consumed from p by t
+        # Every node ID referenced in the file gets an index into node_ids
+        # and node_kinds (a byte array of NODE_* kinds). IDs that are only
+        # used by arcs and never declared keep the NODE_UNKNOWN kind.
+        self.node_index: Dict[str, int] = {}
+        self.node_ids: List[str] = []
+        self.node_kinds = bytearray()
+        
+        # Sparse pre and post matrices: pre[t][p] = tokens consumed from p by
+        # t. Rows only hold the places t has arcs with; read them with .get
         self.pre_matrix: Dict[str, Dict[str, int]] = {}  # pre[transition_id][place_id] = weight
         self.post_matrix: Dict[str, Dict[str, int]] = {}  # post[transition_id][place_id] = weight
         
-        # Initial marking as a tuple (0/1 for each place)
-        self.initial_marking: Tuple[int, ...] = ()
+        # Markings of a 1-safe net are stored as int bitmasks: bit i is set
+        # iff place place_ids[i] holds a token (see marking_to_tuple)
+        self.initial_marking: int = 0
+        
+        # Bitmasks of pre-places and post-places, as parallel lists indexed
+        # like transition_ids, so enabling and firing are single bitwise
+        # operations on a marking
+        self.transition_to_index: Dict[str, int] = {}  # Map transition ID to index
+        self.pre_masks: List[int] = []
+        self.post_masks: List[int] = []
+        
+        # (place index, weight) pairs of the arcs actually attached to each
+        # transition, indexed like transition_ids, so callers need not scan
+        # the zero entries of a matrix row
+        self.pre_places: List[List[Tuple[int, int]]] = []
+        self.post_places: List[List[Tuple[int, int]]] = []
+        
+        # Transition indices by ascending pre-place count: transitions with
+        # few pre-places are the likeliest to be enabled, so checking them
+        # first ends is_dead_marking sooner
+        self.transition_check_order: List[int] = []
+        
+        # (code, id, detail) tuples found by parse_pnml, see ERROR_FORMATS
+        self.consistency_errors: List[Tuple[str, str, Optional[str]]] = []
     
     def build_matrices(self):
         """Build pre and post matrices from arcs."""
-        # Initialize matrices
+        # Initialize matrices with empty rows; only arcs add entries, so
+        # building them is O(T + A) rather than O(T * P)
         for tid in self.transition_ids:
-            self.pre_matrix[tid] = {pid: 0 for pid in self.place_ids}
-            self.post_matrix[tid] = {pid: 0 for pid in self.place_ids}
+            self.pre_matrix[tid] = {}
+            self.post_matrix[tid] = {}
         
-        # Fill matrices from arcs
-        for arc in self.arcs:
-            if arc.source in self.places and arc.target in self.transitions:
+        # Fill matrices from arcs. The source kind alone tells the arc's
+        # direction once the target kind is known to differ from it
+        node_ids, kinds = self.node_ids, self.node_kinds
+        for s, t, weight in zip(self.arc_sources, self.arc_targets, self.arc_weights):
+            source_kind = kinds[s]
+            if source_kind ^ kinds[t] != _VALID_ARC_KINDS:
+                continue  # Invalid arc, already reported by the consistency check
+            if source_kind == NODE_PLACE:
                 # Place -> Transition: pre-arc
-                if arc.target not in self.pre_matrix:
-                    self.pre_matrix[arc.target] = {pid: 0 for pid in self.place_ids}
-                self.pre_matrix[arc.target][arc.source] = arc.weight
-            elif arc.source in self.transitions and arc.target in self.places:
+                self.pre_matrix[node_ids[t]][node_ids[s]] = weight
+            else:
                 # Transition -> Place: post-arc
-                if arc.source not in self.post_matrix:
-                    self.post_matrix[arc.source] = {pid: 0 for pid in self.place_ids}
-                self.post_matrix[arc.source][arc.target] = arc.weight
-    
-    def is_transition_enabled(self, marking: Tuple[int, ...], transition_id: str) -> bool:
+                self.post_matrix[node_ids[s]][node_ids[t]] = weight
+        
+        # A pre-arc weight above 1 can never be satisfied in a 1-safe net;
+        # such transitions get a bit no marking ever carries, so they are
+        # never enabled
+        never_enabled_bit = 1 << len(self.place_ids)
+        self.transition_to_index = {tid: t for t, tid in enumerate(self.transition_ids)}
+        self.pre_masks = []
+        self.post_masks = []
+        self.pre_places = []
+        self.post_places = []
+        for tid in self.transition_ids:
+            pre_places = sorted((self.place_to_index[pid], weight)
+                                for pid, weight in self.pre_matrix[tid].items() if weight > 0)
+            post_places = sorted((self.place_to_index[pid], weight)
+                                 for pid, weight in self.post_matrix[tid].items() if weight > 0)
+            pre_mask = 0
+            for i, weight in pre_places:
+                pre_mask |= 1 << i
+                if weight > 1:
+                    pre_mask |= never_enabled_bit
+            post_mask = 0
+            for i, _ in post_places:
+                post_mask |= 1 << i
+            self.pre_places.append(pre_places)
+            self.post_places.append(post_places)
+            self.pre_masks.append(pre_mask)
+            self.post_masks.append(post_mask)
+        self.transition_check_order = sorted(range(len(self.transition_ids)),
+                                             key=lambda t: len(self.pre_places[t]))
+    
+    def node(self, node_id: str) -> int:
+        """Return the index of a node ID, registering it as unknown if new."""
+        idx = self.node_index.get(node_id)
+        if idx is None:
+            idx = self.node_index[node_id] = len(self.node_ids)
+            self.node_ids.append(node_id)
+            self.node_kinds.append(NODE_UNKNOWN)
+        return idx
+    
+    def marking_to_tuple(self, marking: int) -> Tuple[int, ...]:
+        """Expand a bitmask marking into a 0/1 tuple in place_ids order."""
+        return tuple((marking >> i) & 1 for i in range(len(self.place_ids)))
+    
+    def tuple_to_marking(self, marking: Tuple[int, ...]) -> int:
+        """Pack a 0/1 tuple in place_ids order into a bitmask marking."""
+        return sum(1 << i for i, tokens in enumerate(marking) if tokens)
+    
+    def is_transition_enabled(self, marking: int, transition_id: str) -> bool:
         """Check if a transition is enabled at a given marking."""
-        if transition_id not in self.pre_matrix:
+        t = self.transition_to_index.get(transition_id)
+        if t is None:
             return False
-        
-        for place_id, weight in self.pre_matrix[transition_id].items():
-            if weight > 0:
-                place_idx = self.place_to_index[place_id]
-                if marking[place_idx] < weight:
-                    return False
-        return True
+        pre_mask = self.pre_masks[t]
+        return marking & pre_mask == pre_mask
     
-    def fire_transition(self, marking: Tuple[int, ...], transition_id: str) -> Tuple[int, ...]:
+    def fire_transition(self, marking: int, transition_id: str) -> int:
         """Fire a transition and return the new marking."""
-        new_marking = list(marking)
-        
-        # Subtract pre-arc weights
-        if transition_id in self.pre_matrix:
-            for place_id, weight in self.pre_matrix[transition_id].items():
-                if weight > 0:
-                    place_idx = self.place_to_index[place_id]
-                    new_marking[place_idx] -= weight
-        
-        # Add post-arc weights
-        if transition_id in self.post_matrix:
-            for place_id, weight in self.post_matrix[transition_id].items():
-                if weight > 0:
-                    place_idx = self.place_to_index[place_id]
-                    new_marking[place_idx] += weight
-        
-        return tuple(new_marking)
+        t = self.transition_to_index[transition_id]
+        return (marking & ~self.pre_masks[t]) | self.post_masks[t]
     
-    def is_dead_marking(self, marking: Tuple[int, ...]) -> bool:
+    def is_dead_marking(self, marking: int) -> bool:
         """Check if a marking is dead (no transition is enabled)."""
-        for tid in self.transition_ids:
-            if self.is_transition_enabled(marking, tid):
+        pre_masks = self.pre_masks
+        for t in self.transition_check_order:
+            pre_mask = pre_masks[t]
+            if marking & pre_mask == pre_mask:
                 return False
         return True
 
 
 class Place:
     """Represents a place in a Petri net."""
+    __slots__ = ("id", "name", "initial_marking")
+    
     def __init__(self, id: str, name: Optional[str] = None, initial_marking: int = 0):
         self.id = id
         self.name = name or id
@@ -128,162 +245,410 @@ class Place:
 
 class Transition:
     """Represents a transition in a Petri net."""
+    __slots__ = ("id", "name")
+    
     def __init__(self, id: str, name: Optional[str] = None):
         self.id = id
         self.name = name or id
 
 
-class Arc:
-    """Represents an arc in a Petri net."""
-    def __init__(self, id: str, source: str, target: str, weight: int = 1):
-        self.id = id
-        self.source = source
-        self.target = target
-        self.weight = weight
-
-
-def parse_pnml(file_path: str) -> PetriNet:
+class _PnmlReader:
     """
-    Task 1: Parse a PNML file and construct the Petri net representation.
+    expat callbacks that build a PetriNet straight from the PNML stream.
     
-    Args:
-        file_path: Path to the PNML file
-        
-    Returns:
-        PetriNet object with parsed structure
+    Only the attributes of place/transition/arc elements and the <text>
+    content of their <name>, <initialMarking> and <inscription> children
+    are needed, so no element tree is built at all.
     """
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    
-    # PNML namespace
-    ns = {"pnml": "http://www.pnml.org/version-2009/grammar/ptnet"}
     
-    net_node = root.find(".//pnml:net", ns)
-    if net_node is None:
-        raise ValueError("No <net> element found in PNML file")
-    
-    pn = PetriNet()
-    
-    # Parse places
-    for p in net_node.findall("pnml:place", ns):
-        pid = p.get("id")
+    def __init__(self):
+        self.pn = PetriNet()
+        self.net_found = False
+        # Consistency is checked while streaming instead of in a second pass
+        # over the arcs (see verify_consistency for the standalone check)
+        self.errors: List[Tuple[str, str, Optional[str]]] = []
+        self.deferred_arcs: List[int] = []  # positions of arcs referencing nodes declared later
+        
+        self.node_tag: Optional[str] = None  # place/transition/arc being read
+        self.node_attrs: Dict[str, str] = {}
+        self.node_texts: Dict[str, str] = {}  # child tag -> its <text> content
+        self.field: Optional[str] = None  # child element of the node being read
+        self.text_parts: Optional[List[str]] = None  # set while inside that child's <text>
+    
+    def start_element(self, tag: str, attrs: Dict[str, str]):
+        if tag in _NODE_TAGS:
+            self.node_tag = tag
+            self.node_attrs = attrs
+            self.node_texts = {}
+        elif self.node_tag is None:
+            if tag == TAG_NET:
+                self.net_found = True
+        elif tag in _TEXT_FIELDS:
+            self.field = tag
+        elif tag == TAG_TEXT and self.field is not None and self.field not in self.node_texts:
+            self.text_parts = []
+    
+    def char_data(self, data: str):
+        if self.text_parts is not None:
+            self.text_parts.append(data)
+    
+    def end_element(self, tag: str):
+        if tag == TAG_TEXT:
+            if self.text_parts is not None:
+                self.node_texts[self.field] = "".join(self.text_parts)
+                self.text_parts = None
+        elif tag in _TEXT_FIELDS:
+            self.field = None
+        elif tag == TAG_PLACE:
+            self.add_place()
+            self.node_tag = None
+        elif tag == TAG_TRANSITION:
+            self.add_transition()
+            self.node_tag = None
+        elif tag == TAG_ARC:
+            self.add_arc()
+            self.node_tag = None
+    
+    def add_place(self):
+        pn = self.pn
+        pid = self.node_attrs.get("id")
         if not pid:
             raise ValueError("Place missing id attribute")
+        # Interned IDs hash once and compare by identity in later lookups
+        pid = sys.intern(pid)
         
-        name_node = p.find("pnml:name/pnml:text", ns)
-        name = name_node.text if name_node is not None else pid
+        name = self.node_texts.get(TAG_NAME)
         
         # Parse initial marking
         initial_marking = 0
-        marking_node = p.find("pnml:initialMarking/pnml:text", ns)
-        if marking_node is not None and marking_node.text:
+        marking_text = self.node_texts.get(TAG_INITIAL_MARKING)
+        if marking_text:
             try:
-                initial_marking = int(marking_node.text.strip())
+                initial_marking = int(marking_text.strip())
                 if initial_marking < 0 or initial_marking > 1:
                     raise ValueError(f"Place {pid} has invalid initial marking (must be 0 or 1 for 1-safe nets)")
             except ValueError as e:
                 raise ValueError(f"Invalid initial marking for place {pid}: {e}")
         
-        pn.places[pid] = Place(pid, name, initial_marking)
-        pn.place_ids.append(pid)
-        pn.place_to_index[pid] = len(pn.place_ids) - 1
-    
-    # Parse transitions
-    for t in net_node.findall("pnml:transition", ns):
-        tid = t.get("id")
+        if pid in pn.places:
+            self.errors.append(("duplicate_place", pid, None))
+        else:
+            pn.places[pid] = Place(pid, name, initial_marking)
+            pn.place_ids.append(pid)
+            pn.place_to_index[pid] = len(pn.place_ids) - 1
+            pn.node_kinds[pn.node(pid)] = NODE_PLACE
+    
+    def add_transition(self):
+        pn = self.pn
+        tid = self.node_attrs.get("id")
         if not tid:
             raise ValueError("Transition missing id attribute")
+        tid = sys.intern(tid)
         
-        name_node = t.find("pnml:name/pnml:text", ns)
-        name = name_node.text if name_node is not None else tid
+        name = self.node_texts.get(TAG_NAME)
         
-        pn.transitions[tid] = Transition(tid, name)
-        pn.transition_ids.append(tid)
-    
-    # Parse arcs
-    for a in net_node.findall("pnml:arc", ns):
-        aid = a.get("id")
-        source = a.get("source")
-        target = a.get("target")
+        if tid in pn.transitions:
+            self.errors.append(("duplicate_transition", tid, None))
+        else:
+            pn.transitions[tid] = Transition(tid, name)
+            pn.transition_ids.append(tid)
+            pn.node_kinds[pn.node(tid)] = NODE_TRANSITION
+    
+    def add_arc(self):
+        pn = self.pn
+        aid = self.node_attrs.get("id")
+        source = self.node_attrs.get("source")
+        target = self.node_attrs.get("target")
         
         if not aid or not source or not target:
             raise ValueError(f"Arc missing required attributes: id, source, or target")
+        source = sys.intern(source)
+        target = sys.intern(target)
         
         # Parse arc weight (inscription)
         weight = 1  # Default weight
-        inscription_node = a.find("pnml:inscription/pnml:text", ns)
-        if inscription_node is not None and inscription_node.text:
+        inscription_text = self.node_texts.get(TAG_INSCRIPTION)
+        if inscription_text:
             try:
-                weight = int(inscription_node.text.strip())
+                weight = int(inscription_text.strip())
                 if weight < 1:
                     raise ValueError(f"Arc {aid} has invalid weight (must be >= 1)")
             except ValueError as e:
                 raise ValueError(f"Invalid weight for arc {aid}: {e}")
         
-        pn.arcs.append(Arc(aid, source, target, weight))
+        s = pn.node(source)
+        t = pn.node(target)
+        pn.arc_ids.append(aid)
+        pn.arc_sources.append(s)
+        pn.arc_targets.append(t)
+        pn.arc_weights.append(weight)
+        
+        # Validate the arc now if both endpoints are already known;
+        # forward references are checked once every node has been seen
+        source_kind = pn.node_kinds[s]
+        target_kind = pn.node_kinds[t]
+        if source_kind and target_kind:
+            if source_kind == target_kind:
+                self.errors.extend(_arc_errors(pn, len(pn.arc_ids) - 1))
+        else:
+            self.deferred_arcs.append(len(pn.arc_ids) - 1)
+
+
+class _NetSnapshot(NamedTuple):
+    """Immutable copy of a parsed PNML file, shared between parse_pnml calls."""
+    places: Tuple[Tuple[str, Optional[str], int], ...]  # (id, name, initial marking)
+    transitions: Tuple[Tuple[str, Optional[str]], ...]  # (id, name)
+    node_ids: Tuple[str, ...]
+    node_kinds: bytes
+    arc_ids: Tuple[str, ...]
+    arc_sources: bytes  # raw array('i') contents, 4 bytes per arc
+    arc_targets: bytes
+    arc_weights: Tuple[int, ...]
+    consistency_errors: Tuple[Tuple[str, str, Optional[str]], ...]
+    
+    def to_petri_net(self) -> PetriNet:
+        """Build a fresh, independently mutable PetriNet from the snapshot."""
+        pn = PetriNet()
+        for pid, name, initial_marking in self.places:
+            pn.places[pid] = Place(pid, name, initial_marking)
+            pn.place_to_index[pid] = len(pn.place_ids)
+            pn.place_ids.append(pid)
+        for tid, name in self.transitions:
+            pn.transitions[tid] = Transition(tid, name)
+            pn.transition_ids.append(tid)
+        pn.node_ids = list(self.node_ids)
+        pn.node_index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        pn.node_kinds = bytearray(self.node_kinds)
+        pn.arc_ids = list(self.arc_ids)
+        pn.arc_sources = array('i', self.arc_sources)
+        pn.arc_targets = array('i', self.arc_targets)
+        pn.arc_weights = list(self.arc_weights)
+        pn.consistency_errors = list(self.consistency_errors)
+        return pn
+
+
+@lru_cache(maxsize=128)
+def _read_pnml(file_path: str, mtime_ns: int, size: int) -> _NetSnapshot:
+    """
+    Parse and validate a PNML file into a snapshot.
     
-    # Verify consistency
-    verify_consistency(pn)
+    Cached on (path, mtime, size), so re-parsing an unchanged file during
+    iterative analysis skips the XML pass entirely.
+    """
+    reader = _PnmlReader()
+    parser = expat.ParserCreate(namespace_separator=NS_SEPARATOR)
+    parser.buffer_text = True  # deliver each text run in one callback
+    parser.StartElementHandler = reader.start_element
+    parser.EndElementHandler = reader.end_element
+    parser.CharacterDataHandler = reader.char_data
+    with open(file_path, "rb") as f:
+        parser.ParseFile(f)
+    
+    if not reader.net_found:
+        raise ValueError("No <net> element found in PNML file")
+    
+    pn = reader.pn
+    errors = reader.errors
+    for i in reader.deferred_arcs:
+        errors.extend(_arc_errors(pn, i))
+    
+    return _NetSnapshot(
+        places=tuple((pid, pn.places[pid].name, pn.places[pid].initial_marking)
+                     for pid in pn.place_ids),
+        transitions=tuple((tid, pn.transitions[tid].name) for tid in pn.transition_ids),
+        node_ids=tuple(pn.node_ids),
+        node_kinds=bytes(pn.node_kinds),
+        arc_ids=tuple(pn.arc_ids),
+        arc_sources=pn.arc_sources.tobytes(),
+        arc_targets=pn.arc_targets.tobytes(),
+        arc_weights=tuple(pn.arc_weights),
+        consistency_errors=tuple(errors),
+    )
+
+
+def parse_pnml(file_path: str, verbose: bool = True) -> PetriNet:
+    """
+    Task 1: Parse a PNML file and construct the Petri net representation.
+    
+    Repeated calls on an unchanged file reuse the cached parse result but
+    still return a new PetriNet each time.
+    
+    Args:
+        file_path: Path to the PNML file
+        verbose: Print the consistency report and a parsing summary
+        
+    Returns:
+        PetriNet object with parsed structure (consistency problems are
+        kept in pn.consistency_errors)
+    """
+    file_path = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    pn = _read_pnml(file_path, stat.st_mtime_ns, stat.st_size).to_petri_net()
+    errors = pn.consistency_errors
     
     # Build internal matrices
     pn.build_matrices()
     
     # Set initial marking
-    pn.initial_marking = tuple(pn.places[pid].initial_marking for pid in pn.place_ids)
+    pn.initial_marking = pn.tuple_to_marking(
+        tuple(pn.places[pid].initial_marking for pid in pn.place_ids))
     
-    print(f"\tPNML file parsed successfully!")
-    print(f"\tPlaces: {len(pn.places)}")
-    print(f"\tTransitions: {len(pn.transitions)}")
-    print(f"\tArcs: {len(pn.arcs)}")
-    print(f"\tInitial marking: {pn.initial_marking}")
+    if verbose:
+        report_consistency(errors)
+        print(f"\tPNML file parsed successfully!")
+        print(f"\tPlaces: {len(pn.places)}")
+        print(f"\tTransitions: {len(pn.transitions)}")
+        print(f"\tArcs: {len(pn.arc_ids)}")
+        print(f"\tInitial marking: {pn.marking_to_tuple(pn.initial_marking)}")
     
     return pn
 
 
+def parse_many(file_paths: List[str], max_workers: Optional[int] = None) -> List[PetriNet]:
+    """
+    Parse several PNML files in parallel, one file per worker process.
+    
+    Parsing is independent per file, so the batch is spread over a process
+    pool (processes rather than threads, since most of parse_pnml holds the
+    GIL). Workers parse quietly; check pn.consistency_errors on the results.
+    
+    Args:
+        file_paths: Paths to the PNML files
+        max_workers: Number of worker processes (default: CPU count)
+        
+    Returns:
+        PetriNet objects in the same order as file_paths
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(partial(parse_pnml, verbose=False), file_paths, chunksize=8))
+
+
+# Task 2 lists the reachable markings only up to this many; printing huge
+# state spaces would dominate the run time
+MAX_LISTED_MARKINGS = 64
+
+# Nets with at most this many places record visited markings in a byte map
+# indexed by the marking bitmask itself (2**P bytes, 64 KiB at the limit).
+# The map is sized by the place count, not by how many markings are
+# reachable, so it is only used while it stays cheap either way
+VISITED_MAP_MAX_PLACES = 16
+
+# Error code for an arc whose endpoints are both of the given kind
+_BIPARTITE_ERRORS = {NODE_PLACE: "place_to_place", NODE_TRANSITION: "transition_to_transition"}
+
+
+def _arc_errors(pn: PetriNet, i: int) -> List[Tuple[str, str, Optional[str]]]:
+    """Check the i-th arc against the places and transitions of the net."""
+    errors = []
+    aid = pn.arc_ids[i]
+    s, t = pn.arc_sources[i], pn.arc_targets[i]
+    source_kind = pn.node_kinds[s]
+    target_kind = pn.node_kinds[t]
+    if source_kind == NODE_UNKNOWN:
+        errors.append(("bad_source", aid, pn.node_ids[s]))
+    if target_kind == NODE_UNKNOWN:
+        errors.append(("bad_target", aid, pn.node_ids[t]))
+    elif source_kind == target_kind:
+        errors.append((_BIPARTITE_ERRORS[source_kind], aid, None))
+    return errors
+
+
+def report_consistency(errors: List[Tuple[str, str, Optional[str]]]) -> bool:
+    """
+    Print the result of a consistency check and return True if it passed.
+    
+    Args:
+        errors: (code, id, detail) tuples, formatted here via ERROR_FORMATS
+    """
+    if errors:
+        print("\tInconsistencies found:")
+        for code, node_id, detail in errors:
+            print("\t - " + ERROR_FORMATS[code].format(node_id, detail))
+        return False
+    
+    print("\tPetri net structure is consistent")
+    return True
+
+
 def verify_consistency(pn: PetriNet) -> bool:
     """
-    Verify the consistency of the Petri net structure.
+    Verify the consistency of an already built Petri net structure.
+    
+    parse_pnml performs the same checks while streaming the file (and also
+    reports duplicate IDs, which the places/transitions dicts cannot hold).
     
     Checks:
     - All arcs reference valid nodes
     - Bipartite structure (places <-> transitions only)
-    - No duplicate IDs
     """
     errors = []
     
-    # Collect all valid node IDs
-    nodes = set(pn.places.keys()) | set(pn.transitions.keys())
+    # Endpoints are small ints, so each arc costs two byte-array reads. An
+    # arc is valid iff it joins a place and a transition, i.e. the XOR of
+    # its endpoint kinds is PLACE ^ TRANSITION (unknown kinds are 0, and
+    # equal kinds XOR to 0); only offending arcs get a detailed check.
+    kinds = pn.node_kinds
+    for i, (s, t) in enumerate(zip(pn.arc_sources, pn.arc_targets)):
+        if kinds[s] ^ kinds[t] != _VALID_ARC_KINDS:
+            errors.extend(_arc_errors(pn, i))
     
-    # Check arcs
-    for arc in pn.arcs:
-        if arc.source not in nodes:
-            errors.append(f"Arc {arc.id}: invalid source '{arc.source}'")
-        if arc.target not in nodes:
-            errors.append(f"Arc {arc.id}: invalid target '{arc.target}'")
-        
-        # Enforce bipartite structure
-        if arc.source in pn.places and arc.target in pn.places:
-            errors.append(f"Arc {arc.id}: connects place to place (invalid)")
-        if arc.source in pn.transitions and arc.target in pn.transitions:
-            errors.append(f"Arc {arc.id}: connects transition to transition (invalid)")
-    
-    # Check for duplicate IDs
-    if len(pn.places) != len(set(pn.places.keys())):
-        errors.append("Duplicate place IDs detected")
-    if len(pn.transitions) != len(set(pn.transitions.keys())):
-        errors.append("Duplicate transition IDs detected")
+    return report_consistency(errors)
+
+
+def _bfs_visited_set(initial_marking: int, masks: List[Tuple[int, int]]) -> Set[int]:
+    """Breadth-first search from initial_marking, tracking visited markings in a set."""
+    reachable = {initial_marking}
+    frontier = [initial_marking]
+    
+    # Explore level by level: each round expands the whole frontier and
+    # collects the newly discovered markings as the next one
+    while frontier:
+        next_frontier = []
+        for current_marking in frontier:
+            # Try to fire each transition
+            for pre_mask, post_mask in masks:
+                if current_marking & pre_mask == pre_mask:
+                    new_marking = (current_marking & ~pre_mask) | post_mask
+                    
+                    if new_marking not in reachable:
+                        reachable.add(new_marking)
+                        next_frontier.append(new_marking)
+        frontier = next_frontier
     
-    if errors:
-        print("\tInconsistencies found:")
-        for e in errors:
-            print(f"\t - {e}")
-        return False
+    return reachable
+
+
+def _bfs_visited_map(initial_marking: int, masks: List[Tuple[int, int]],
+                     num_places: int) -> Set[int]:
+    """
+    Breadth-first search from initial_marking, tracking visited markings in
+    a byte map with one entry per possible marking.
     
-    print("\tPetri net structure is consistent")
-    return True
+    Indexing the map by the marking replaces hashing on every successor;
+    the set of reachable markings is built once at the end.
+    """
+    visited = bytearray(1 << num_places)
+    visited[initial_marking] = 1
+    found = [initial_marking]
+    frontier = [initial_marking]
+    
+    while frontier:
+        next_frontier = []
+        for current_marking in frontier:
+            for pre_mask, post_mask in masks:
+                if current_marking & pre_mask == pre_mask:
+                    new_marking = (current_marking & ~pre_mask) | post_mask
+                    
+                    if not visited[new_marking]:
+                        visited[new_marking] = 1
+                        next_frontier.append(new_marking)
+        found.extend(next_frontier)
+        frontier = next_frontier
+    
+    return set(found)
 
 
-def explicit_reachability(pn: PetriNet) -> Set[Tuple[int, ...]]:
+def explicit_reachability(pn: PetriNet) -> Set[int]:
     """
     Task 2: Compute all reachable markings using BFS.
     
@@ -291,34 +656,36 @@ def explicit_reachability(pn: PetriNet) -> Set[Tuple[int, ...]]:
         pn: PetriNet object
         
     Returns:
-        Set of all reachable markings (as tuples)
+        Set of all reachable markings (as bitmasks, see PetriNet.marking_to_tuple)
     """
     print("\n=== Task 2: Explicit Reachability Computation (BFS) ===")
     start_time = time.time()
     
-    reachable = set()
-    queue = deque([pn.initial_marking])
-    reachable.add(pn.initial_marking)
+    # Walk the mask lists directly rather than going through the per-ID
+    # is_transition_enabled/fire_transition lookups for every transition
+    masks = list(zip(pn.pre_masks, pn.post_masks))
     
-    while queue:
-        current_marking = queue.popleft()
-        
-        # Try to fire each transition
-        for tid in pn.transition_ids:
-            if pn.is_transition_enabled(current_marking, tid):
-                new_marking = pn.fire_transition(current_marking, tid)
-                
-                if new_marking not in reachable:
-                    reachable.add(new_marking)
-                    queue.append(new_marking)
+    if len(pn.place_ids) <= VISITED_MAP_MAX_PLACES:
+        reachable = _bfs_visited_map(pn.initial_marking, masks, len(pn.place_ids))
+        visited_map_size = 1 << len(pn.place_ids)
+    else:
+        reachable = _bfs_visited_set(pn.initial_marking, masks)
+        visited_map_size = 0
     
     elapsed_time = time.time() - start_time
     
     print(f"\tFound {len(reachable)} reachable markings:")
-    for r in reachable:
-        print(f"\t  -  {r}")
+    if len(reachable) <= MAX_LISTED_MARKINGS:
+        print("\n".join(f"\t  -  {pn.marking_to_tuple(r)}" for r in reachable))
+    else:
+        print(f"\t  (listing omitted, more than {MAX_LISTED_MARKINGS} markings)")
     print(f"\tComputation time: {elapsed_time:.4f} seconds")
-    print(f"\tMemory: ~{sys.getsizeof(reachable) + sum(sys.getsizeof(m) for m in reachable)} bytes")
+    
+    # Estimate memory from the largest possible marking rather than
+    # measuring every element of the set, plus the byte map if one was used
+    marking_size = sys.getsizeof((1 << len(pn.place_ids)) - 1)
+    memory = sys.getsizeof(reachable) + len(reachable) * marking_size + visited_map_size
+    print(f"\tMemory: ~{memory} bytes")
     
     return reachable
 
@@ -342,6 +709,9 @@ def symbolic_reachability_bdd(pn: PetriNet) -> Optional[object]:
     
     # Create BDD manager
     bdd_manager = _bdd.BDD()
+    if BDD_BACKEND == "cudd":
+        # Dynamic variable reordering (sifting) is native in CUDD
+        bdd_manager.configure(reordering=True)
     
     # Create variables for current state (x_p for each place p)
     current_vars = {}
@@ -365,7 +735,8 @@ def symbolic_reachability_bdd(pn: PetriNet) -> Optional[object]:
     
     # Compute reachable set iteratively
     reach_bdd = init_bdd
-    prev_size = 0
+    quantified_vars = set(current_vars.values())
+    rename_map = {next_vars[pid]: current_vars[pid] for pid in pn.place_ids}
     
     iteration = 0
     while True:
@@ -373,28 +744,19 @@ def symbolic_reachability_bdd(pn: PetriNet) -> Optional[object]:
         
         # Compute image: ∃x. (Reach(x) ∧ R(x, x'))
         # This gives us all next states reachable in one step
-        image = bdd_manager.exist(current_vars.values(), 
-                                   bdd_manager.apply('and', reach_bdd, transition_relation))
+        image = relational_product(bdd_manager, reach_bdd, transition_relation, quantified_vars)
         
         # Rename next variables back to current variables
-        rename_map = {next_vars[pid]: current_vars[pid] for pid in pn.place_ids}
         image_renamed = bdd_manager.let(rename_map, image)
         
-        # Check if we found new states
-        new_states = bdd_manager.apply('and', image_renamed, 
-                                       bdd_manager.apply('not', reach_bdd))
-        
-        if new_states == bdd_manager.false:
+        # Fixpoint reached when the image adds no new states; BDDs are
+        # canonical, so this is a node comparison
+        new_reach = reach_bdd | image_renamed
+        if new_reach == reach_bdd:
             break
         
         # Update reachable set
-        reach_bdd = bdd_manager.apply('or', reach_bdd, image_renamed)
-        
-        # Count states (for progress)
-        count = count_bdd_assignments(bdd_manager, reach_bdd, current_vars.values())
-        if count == prev_size:
-            break
-        prev_size = count
+        reach_bdd = new_reach
     
     elapsed_time = time.time() - start_time
     
@@ -405,6 +767,7 @@ def symbolic_reachability_bdd(pn: PetriNet) -> Optional[object]:
     print(f"\tBDD representation of all markings: {bdd_manager.to_expr(reach_bdd)}")
     print(f"\tComputation time: {elapsed_time:.4f} seconds")
     print(f"\tIterations: {iteration}")
+    print(f"\tBDD backend: dd.{BDD_BACKEND}")
     
     # Memory usage tracking
     bdd_size = sys.getsizeof(reach_bdd)
@@ -412,7 +775,10 @@ def symbolic_reachability_bdd(pn: PetriNet) -> Optional[object]:
     
     # Get BDD statistics if available
     try:
-        stats = bdd_manager.statistics()
+        # dd.cudd warns that 'mem' is now reported in bytes, as printed below
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            stats = bdd_manager.statistics()
         if stats and 'n_nodes' in stats:
             print(f"\tBDD node count: {stats['n_nodes']}")
         if stats and 'mem' in stats:
@@ -425,22 +791,67 @@ def symbolic_reachability_bdd(pn: PetriNet) -> Optional[object]:
     return reach_bdd, bdd_manager, current_vars
 
 
-def build_initial_marking_bdd(bdd_manager, pn: PetriNet, current_vars: Dict[str, str]) -> object:
-    """Build BDD for initial marking."""
-    clauses = []
-    for i, pid in enumerate(pn.place_ids):
-        var = current_vars[pid]
-        if pn.initial_marking[i] == 1:
-            clauses.append(bdd_manager.var(var))
-        else:
-            clauses.append(bdd_manager.apply('not', bdd_manager.var(var)))
+def relational_product(bdd_manager, u, v, qvars: Set[str]) -> object:
+    """
+    Compute ∃qvars. (u ∧ v) without building the full conjunction when possible.
+    
+    Args:
+        bdd_manager: BDD manager
+        u, v: BDD nodes to conjoin
+        qvars: Names of the variables to quantify out
+        
+    Returns:
+        BDD of the quantified conjunction
+    """
+    if BDD_BACKEND == "cudd":
+        # CUDD's AndExist conjoins and quantifies in a single pass
+        return _bdd.and_exists(u, v, qvars)
+    return bdd_manager.exist(qvars, u & v)
+
+
+def balanced_apply(bdd_manager, op: str, nodes: List[object]) -> object:
+    """
+    Combine BDD nodes with 'and' or 'or' as a balanced tree of applications.
     
-    # Conjunction of all place conditions
-    result = clauses[0]
-    for clause in clauses[1:]:
-        result = bdd_manager.apply('and', result, clause)
+    A left fold builds one ever-growing intermediate result per operand;
+    pairing operands keeps the intermediates small. The absorbing element
+    (false for 'and', true for 'or') short-circuits the reduction.
     
-    return result
+    Args:
+        bdd_manager: BDD manager
+        op: 'and' or 'or'
+        nodes: BDD nodes to combine
+        
+    Returns:
+        BDD of the combined nodes (the identity element if nodes is empty)
+    """
+    if op == 'and':
+        combine = operator.and_
+        identity, absorbing = bdd_manager.true, bdd_manager.false
+    else:
+        combine = operator.or_
+        identity, absorbing = bdd_manager.false, bdd_manager.true
+    
+    nodes = [u for u in nodes if u != identity]
+    while len(nodes) > 1:
+        if absorbing in nodes:
+            return absorbing
+        paired = [combine(nodes[i], nodes[i + 1])
+                  for i in range(0, len(nodes) - 1, 2)]
+        if len(nodes) % 2:
+            paired.append(nodes[-1])
+        nodes = paired
+    
+    return nodes[0] if nodes else identity
+
+
+def build_initial_marking_bdd(bdd_manager, pn: PetriNet, current_vars: Dict[str, str]) -> object:
+    """Build BDD for initial marking."""
+    # A full assignment of the current variables is a cube, which the
+    # manager builds directly instead of conjoining one literal per place
+    assignment = {current_vars[pid]: bool((pn.initial_marking >> i) & 1)
+                  for i, pid in enumerate(pn.place_ids)}
+    return bdd_manager.cube(assignment)
 
 
 def build_transition_relation_bdd(bdd_manager, pn: PetriNet, 
@@ -449,153 +860,212 @@ def build_transition_relation_bdd(bdd_manager, pn: PetriNet,
     """Build BDD for transition relation R(x, x')."""
     transition_relations = []
     
-    for tid in pn.transition_ids:
+    # Variable nodes and their negations, built once per place rather than
+    # per transition
+    current_bdds = {pid: bdd_manager.var(var) for pid, var in current_vars.items()}
+    next_bdds = {pid: bdd_manager.var(var) for pid, var in next_vars.items()}
+    not_current_bdds = {pid: ~u for pid, u in current_bdds.items()}
+    not_next_bdds = {pid: ~u for pid, u in next_bdds.items()}
+    
+    for t, tid in enumerate(pn.transition_ids):
+        pre_t = pn.pre_matrix.get(tid, {})
+        post_t = pn.post_matrix.get(tid, {})
+        
         # Build enabled condition: all pre-places have enough tokens
-        enabled_conditions = []
-        for pid in pn.place_ids:
-            place_idx = pn.place_to_index[pid]
-            pre_weight = pn.pre_matrix.get(tid, {}).get(pid, 0)
-            
-            if pre_weight > 0:
-                # Need token in current state
-                enabled_conditions.append(bdd_manager.var(current_vars[pid]))
-        
-        if enabled_conditions:
-            enabled = enabled_conditions[0]
-            for cond in enabled_conditions[1:]:
-                enabled = bdd_manager.apply('and', enabled, cond)
-        else:
-            enabled = bdd_manager.true
+        enabled_conditions = [current_bdds[pn.place_ids[i]] for i, _ in pn.pre_places[t]]
+        
+        enabled = balanced_apply(bdd_manager, 'and', enabled_conditions)
         
         # Build update relation: next state = current state - pre + post
         update_conditions = []
         for pid in pn.place_ids:
-            place_idx = pn.place_to_index[pid]
-            pre_weight = pn.pre_matrix.get(tid, {}).get(pid, 0)
-            post_weight = pn.post_matrix.get(tid, {}).get(pid, 0)
+            pre_weight = pre_t.get(pid, 0)
+            post_weight = post_t.get(pid, 0)
             
-            current_var = current_vars[pid]
-            next_var = next_vars[pid]
+            current_var_bdd = current_bdds[pid]
+            next_var_bdd = next_bdds[pid]
             
             if pre_weight > 0 and post_weight == 0:
                 # Token consumed: current=1, next=0
-                update_conditions.append(
-                    bdd_manager.apply('and',
-                        bdd_manager.var(current_var),
-                        bdd_manager.apply('not', bdd_manager.var(next_var))
-                    )
-                )
+                update_conditions.append(current_var_bdd & not_next_bdds[pid])
             elif pre_weight == 0 and post_weight > 0:
                 # Token produced: current=0, next=1
-                update_conditions.append(
-                    bdd_manager.apply('and',
-                        bdd_manager.apply('not', bdd_manager.var(current_var)),
-                        bdd_manager.var(next_var)
-                    )
-                )
+                update_conditions.append(not_current_bdds[pid] & next_var_bdd)
             elif pre_weight > 0 and post_weight > 0:
                 # Token moved: current=1, next=1 (no change)
-                update_conditions.append(
-                    bdd_manager.apply('and',
-                        bdd_manager.var(current_var),
-                        bdd_manager.var(next_var)
-                    )
-                )
+                update_conditions.append(current_var_bdd & next_var_bdd)
             else:
                 # No change: current=next
-                # Encode: (current AND next) OR (NOT current AND NOT next)
-                current_var_bdd = bdd_manager.var(current_var)
-                next_var_bdd = bdd_manager.var(next_var)
-                equiv = bdd_manager.apply('or',
-                    bdd_manager.apply('and', current_var_bdd, next_var_bdd),
-                    bdd_manager.apply('and', 
-                        bdd_manager.apply('not', current_var_bdd),
-                        bdd_manager.apply('not', next_var_bdd)
-                    )
-                )
-                update_conditions.append(equiv)
-        
-        if update_conditions:
-            update = update_conditions[0]
-            for cond in update_conditions[1:]:
-                update = bdd_manager.apply('and', update, cond)
-        else:
-            update = bdd_manager.true
+                update_conditions.append(current_var_bdd.equiv(next_var_bdd))
+        
+        update = balanced_apply(bdd_manager, 'and', update_conditions)
         
         # Transition relation: enabled AND update
-        trans_rel = bdd_manager.apply('and', enabled, update)
+        trans_rel = enabled & update
         transition_relations.append(trans_rel)
     
     # Union of all transition relations
-    if transition_relations:
-        result = transition_relations[0]
-        for tr in transition_relations[1:]:
-            result = bdd_manager.apply('or', result, tr)
-    else:
-        result = bdd_manager.false
-    
-    return result
+    return balanced_apply(bdd_manager, 'or', transition_relations)
 
 
 def count_bdd_assignments(bdd_manager, bdd_expr, current_v_vars: List[str]) -> int:
     """Count the number of satisfying assignments for a BDD."""
-    if bdd_expr == bdd_manager.false:
-        return 0
-    if bdd_expr == bdd_manager.true:
-        return 2 ** len(current_v_vars)
+    current_v_vars = list(current_v_vars)
+    if not hasattr(bdd_manager, 'count'):
+        # Managers without model counting: enumerate the models instead
+        return sum(1 for _ in bdd_manager.pick_iter(bdd_expr, care_vars=set(current_v_vars)))
     
-    # Use model counting
-    try:
-        # Simple enumeration approach for small state spaces
-        count = 0
-        for model in bdd_manager.pick_iter(bdd_expr, care_vars=current_v_vars):
-            count += 1
-        return count
-    except Exception:
-        # Fallback: enumerate all possible assignments
-        count = 0
-        num_vars = len(current_v_vars)
-        for i in range(2 ** num_vars):
-            assignment = {}
-            for j, var in enumerate(current_v_vars):
-                assignment[var] = bool((i >> j) & 1)
-            try:
-                if bdd_manager.let(assignment, bdd_expr) == bdd_manager.true:
-                    count += 1
-            except Exception:
-                continue
-        return count
+    # Model counting walks the BDD nodes once rather than every model
+    return int(bdd_manager.count(bdd_expr, nvars=len(current_v_vars)))
+
+
+def compute_p_invariants(pn: PetriNet) -> List[List[int]]:
+    """
+    Compute a basis of the P-invariants of the net.
+    
+    A P-invariant is a place weighting y with y^T * C = 0, where C = Post - Pre
+    is the incidence matrix, so y * M is the same for every reachable marking M.
+    The basis is the null space of C^T, found by exact Gaussian elimination
+    over the rationals.
+    
+    Args:
+        pn: PetriNet object
+        
+    Returns:
+        List of integer weight vectors (in order of place_ids)
+    """
+    num_places = len(pn.place_ids)
+    
+    # One equation per transition: the row of C^T for t
+    rows = []
+    for t in range(len(pn.transition_ids)):
+        row = [Fraction(0)] * num_places
+        for i, weight in pn.pre_places[t]:
+            row[i] -= weight
+        for i, weight in pn.post_places[t]:
+            row[i] += weight
+        if any(row):
+            rows.append(row)
+    
+    # Reduce to row echelon form with unit pivots cleared in every other row
+    pivot_cols = []
+    for c in range(num_places):
+        r = len(pivot_cols)
+        if r == len(rows):
+            break
+        pivot = next((k for k in range(r, len(rows)) if rows[k][c] != 0), None)
+        if pivot is None:
+            continue
+        rows[r], rows[pivot] = rows[pivot], rows[r]
+        lead = rows[r][c]
+        pivot_row = rows[r] = [v / lead for v in rows[r]]
+        for k in range(len(rows)):
+            factor = rows[k][c]
+            if k != r and factor != 0:
+                rows[k] = [a - factor * b for a, b in zip(rows[k], pivot_row)]
+        pivot_cols.append(c)
+    
+    # One basis vector per free column, scaled to coprime integers
+    invariants = []
+    pivot_set = set(pivot_cols)
+    for free_col in range(num_places):
+        if free_col in pivot_set:
+            continue
+        y = [Fraction(0)] * num_places
+        y[free_col] = Fraction(1)
+        for r, c in enumerate(pivot_cols):
+            y[c] = -rows[r][free_col]
+        denominator = 1
+        for v in y:
+            denominator = denominator * v.denominator // gcd(denominator, v.denominator)
+        vector = [int(v * denominator) for v in y]
+        divisor = 0
+        for v in vector:
+            divisor = gcd(divisor, v)
+        invariants.append([v // divisor for v in vector])
+    
+    return invariants
+
+
+def add_p_invariant_constraints(prob, pn: PetriNet, M: Dict[str, object]):
+    """
+    Add y * M == y * M0 to an ILP for every P-invariant y of the net.
+    
+    These hold on every reachable marking, so they cut unreachable markings
+    out of the search space before the solver starts.
+    """
+    for y in compute_p_invariants(pn):
+        initial_value = sum(w for i, w in enumerate(y) if (pn.initial_marking >> i) & 1)
+        prob += pulp.lpSum(w * M[pn.place_ids[i]] for i, w in enumerate(y) if w) == initial_value
 
 
-def deadlock_detection(pn: PetriNet, reachable_markings: Set[Tuple[int, ...]] = None,
+# The cut loops give up after this many no-good cuts; every cut costs a CBC
+# run, and a net without P-invariants can need up to 2**P of them
+MAX_NO_GOOD_CUTS = 100
+
+
+class CutLimitReached(Exception):
+    """Raised by an ILP cut loop that used up MAX_NO_GOOD_CUTS without an answer."""
+
+
+def add_no_good_cut(prob, pn: PetriNet, M: Dict[str, object], marking: Tuple[int, ...]):
+    """Exclude a marking from an ILP: any further solution must differ from it in some place."""
+    prob += pulp.lpSum(1 - M[pid] if tokens else M[pid]
+                       for pid, tokens in zip(pn.place_ids, marking)) >= 1
+
+
+@lru_cache(maxsize=None)
+def ilp_solver():
+    """
+    Return the CBC solver shared by every ILP in this module.
+    
+    warmStart is left off: every re-solve in the cut loops follows a no-good
+    cut that excludes exactly the previous solution, so that solution could
+    only be passed to CBC as an infeasible start.
+    """
+    return pulp.PULP_CBC_CMD(msg=0)
+
+
+def deadlock_detection(pn: PetriNet, reachable_markings: Set[int] = None,
                        bdd_result: Tuple = None) -> Optional[Tuple[int, ...]]:
     """
-    Task 4: Detect deadlocks using ILP + BDD.
+    Task 4: Detect deadlocks.
     
     A deadlock is a reachable marking where no transition is enabled.
     
     Args:
         pn: PetriNet object
-        reachable_markings: Not used (kept for backward compatibility)
+        reachable_markings: Reachable markings from explicit_reachability; when
+            given, they are scanned for a dead marking and the ILP is skipped
         bdd_result: Tuple (bdd, manager, vars) from symbolic computation
         
     Returns:
         A deadlock marking if found, None otherwise
     """
-    print("\n=== Task 4: Deadlock Detection (ILP + BDD) ===")
+    print("\n=== Task 4: Deadlock Detection ===")
     start_time = time.time()
     
-    # Use ILP for deadlock detection
-    if not ILP_AVAILABLE:
+    # The explicit reachable set is already enumerated, so scanning it is
+    # exact and never needs the ILP
+    if reachable_markings is not None:
+        deadlock = find_dead_marking(pn, reachable_markings)
+        method = "in the explicit reachable set"
+    elif not ILP_AVAILABLE:
         print("\tILP library (pulp) not available. Install with: pip install pulp")
         return None
-    
-    deadlock = deadlock_detection_ilp(pn, bdd_result)
+    else:
+        try:
+            deadlock = deadlock_detection_ilp(pn, bdd_result)
+        except CutLimitReached:
+            print(f"\tGave up after {MAX_NO_GOOD_CUTS} no-good cuts: deadlock freedom not established")
+            print(f"\tDetection time: {time.time() - start_time:.4f} seconds")
+            return None
+        method = "via ILP"
     
     elapsed_time = time.time() - start_time
     
     if deadlock is not None:
-        print(f"\tDeadlock found via ILP: {deadlock}")
+        print(f"\tDeadlock found {method}: {deadlock}")
         print(f"\tDetection time: {elapsed_time:.4f} seconds")
         return deadlock
     else:
@@ -604,6 +1074,11 @@ def deadlock_detection(pn: PetriNet, reachable_markings: Set[Tuple[int, ...]] =
         return None
 
 
+def find_dead_marking(pn: PetriNet, reachable_markings: Set[int]) -> Optional[Tuple[int, ...]]:
+    """Return a dead marking from the reachable markings, or None if there is none."""
+    return next((pn.marking_to_tuple(m) for m in reachable_markings if pn.is_dead_marking(m)), None)
+
+
 def deadlock_detection_ilp(pn: PetriNet, bdd_result: Tuple = None) -> Optional[Tuple[int, ...]]:
     """
     Deadlock detection using ILP formulation.
@@ -612,11 +1087,24 @@ def deadlock_detection_ilp(pn: PetriNet, bdd_result: Tuple = None) -> Optional[T
     - Variables: M_p ∈ {0,1} for each place p
     - Constraints:
       1. M is a dead marking: for each transition t, at least one pre-place p has M_p < weight(p,t)
-      2. M is reachable: This is checked using BDD membership oracle
+      2. M is reachable: This is checked against the BDD (see
+         reachability_oracle)
+    
+    Dead markings that the BDD rejects are excluded with a no-good cut
+    and the ILP is solved again, until a reachable one is found or the ILP
+    becomes infeasible.
+    
+    Raises:
+        CutLimitReached: if MAX_NO_GOOD_CUTS cuts did not settle the question
     """
     if not ILP_AVAILABLE:
         return None
     
+    # Without BDD verification, we can't verify reachability
+    is_reachable = reachability_oracle(pn, bdd_result)
+    if is_reachable is None:
+        return None
+    
     # Create ILP problem
     prob = pulp.LpProblem("DeadlockDetection", pulp.LpMaximize)
     
@@ -628,41 +1116,72 @@ def deadlock_detection_ilp(pn: PetriNet, bdd_result: Tuple = None) -> Optional[T
     # Dummy objective (we just need feasibility)
     prob += 0
     
+    # Every reachable marking satisfies the P-invariant equations
+    add_p_invariant_constraints(prob, pn, M)
+    
     # Constraint: Dead marking - for each transition, at least one pre-place is insufficient
-    for tid in pn.transition_ids:
+    for t in range(len(pn.transition_ids)):
+        if any(weight > 1 for _, weight in pn.pre_places[t]):
+            # A pre-arc weight above 1 exceeds any 0/1 marking, so the
+            # transition is never enabled and puts no constraint on M
+            continue
+        
         pre_places = []
-        for pid in pn.place_ids:
-            weight = pn.pre_matrix.get(tid, {}).get(pid, 0)
-            if weight > 0:
-                # M_p < weight means M_p = 0 (since weight >= 1 and M_p ∈ {0,1})
-                # So we need: M_p = 0 for at least one pre-place
-                pre_places.append(1 - M[pid])  # 1 - M_p = 1 if M_p = 0
+        for i, _ in pn.pre_places[t]:
+            # With weight 1, M_p < weight means M_p = 0
+            # So we need: M_p = 0 for at least one pre-place
+            pre_places.append(1 - M[pn.place_ids[i]])  # 1 - M_p = 1 if M_p = 0
         
-        if pre_places:
-            # At least one pre-place has no token
-            prob += sum(pre_places) >= 1
-    
-    # Solve
-    prob.solve(pulp.PULP_CBC_CMD(msg=0))
+        if not pre_places:
+            # A transition without pre-places is always enabled, so no
+            # marking is dead
+            return None
+        
+        # At least one pre-place has no token
+        prob += sum(pre_places) >= 1
     
-    if prob.status == pulp.LpStatusOptimal:
+    for cuts in range(MAX_NO_GOOD_CUTS + 1):
+        # Solve
+        prob.solve(ilp_solver())
+        if prob.status != pulp.LpStatusOptimal:
+            return None
+        
         # Extract marking
         marking_list = []
         for pid in pn.place_ids:
             val = M[pid].varValue
-            marking_list.append(int(val) if val is not None else 0)
+            marking_list.append(int(round(val)) if val is not None else 0)
         marking = tuple(marking_list)
         
-        # Verify reachability using BDD if available
-        if bdd_result is not None and BDD_AVAILABLE:
-            bdd, bdd_manager, current_vars = bdd_result
-            if is_marking_reachable_bdd(bdd_manager, bdd, marking, current_vars, pn):
-                return marking
-        else:
-            # Without BDD, we can't verify reachability, so return None
-            # (In practice, we'd need to check against explicit reachable set)
-            return None
+        # Verify reachability
+        if is_reachable(marking):
+            return marking
+        
+        if cuts == MAX_NO_GOOD_CUTS:
+            raise CutLimitReached()
+        
+        # Unreachable: cut it off and look for the next dead marking
+        add_no_good_cut(prob, pn, M, marking)
+
+
+def reachability_oracle(pn: PetriNet, bdd_result: Tuple = None,
+                        reachable_markings: Set[int] = None) -> Optional[Callable[[Tuple[int, ...]], bool]]:
+    """
+    Build a membership test for the reachable markings of a net.
+    
+    The explicit reachable set answers with one hash lookup, so it is
+    preferred over evaluating the BDD; the BDD is used when no explicit
+    set was computed.
     
+    Returns:
+        Function mapping a 0/1 marking tuple to True iff it is reachable, or
+        None if neither source is available
+    """
+    if reachable_markings is not None:
+        return lambda marking: pn.tuple_to_marking(marking) in reachable_markings
+    if bdd_result is not None and BDD_AVAILABLE:
+        bdd, bdd_manager, current_vars = bdd_result
+        return lambda marking: is_marking_reachable_bdd(bdd_manager, bdd, marking, current_vars, pn)
     return None
 
 
@@ -680,17 +1199,18 @@ def is_marking_reachable_bdd(bdd_manager, bdd, marking: Tuple[int, ...],
 
 def optimize_reachable_markings(pn: PetriNet, 
                                 objective_weights: List[int],
-                                reachable_markings: Set[Tuple[int, ...]] = None,
+                                reachable_markings: Set[int] = None,
                                 bdd_result: Tuple = None) -> Optional[Tuple[Tuple[int, ...], int]]:
     """
-    Task 5: Optimize over reachable markings using ILP.
+    Task 5: Optimize over reachable markings.
     
     Maximize c^T * M where M is a reachable marking and c is the objective weight vector.
     
     Args:
         pn: PetriNet object
         objective_weights: List of weights c_p for each place (in order of place_ids)
-        reachable_markings: Not used (kept for backward compatibility)
+        reachable_markings: Reachable markings from explicit_reachability; when
+            given, the optimum is taken over this set and the ILP is skipped
         bdd_result: Tuple (bdd, manager, vars) from symbolic computation
         
     Returns:
@@ -702,17 +1222,25 @@ def optimize_reachable_markings(pn: PetriNet,
     if len(objective_weights) != len(pn.place_ids):
         raise ValueError(f"Objective weights length ({len(objective_weights)}) must match number of places ({len(pn.place_ids)})")
     
-    # Use ILP for optimization
-    if not ILP_AVAILABLE:
+    # The explicit reachable set is already enumerated, so scanning it is
+    # exact and never needs the ILP
+    if reachable_markings is not None:
+        result = optimize_over_markings(pn, objective_weights, reachable_markings)
+    elif not ILP_AVAILABLE:
         print("\tILP library (pulp) not available. Install with: pip install pulp")
         return None
-    
-    ilp_result = optimize_reachable_markings_ilp(pn, objective_weights, bdd_result)
+    else:
+        try:
+            result = optimize_reachable_markings_ilp(pn, objective_weights, bdd_result)
+        except CutLimitReached:
+            print(f"\tNo reachable optimum found within {MAX_NO_GOOD_CUTS} no-good cuts")
+            print(f"\tComputation time: {time.time() - start_time:.4f} seconds")
+            return None
     
     elapsed_time = time.time() - start_time
     
-    if ilp_result is not None:
-        best_marking, best_value = ilp_result
+    if result is not None:
+        best_marking, best_value = result
         print(f"\tOptimal marking found: {best_marking}")
         print(f"\tOptimal value: {best_value}")
         print(f"\tComputation time: {elapsed_time:.4f} seconds")
@@ -723,6 +1251,16 @@ def optimize_reachable_markings(pn: PetriNet,
         return None
 
 
+def optimize_over_markings(pn: PetriNet, objective_weights: List[int],
+                           reachable_markings: Set[int]) -> Tuple[Tuple[int, ...], int]:
+    """Return the reachable marking with the largest c^T * M, with its value."""
+    def value(marking: int) -> int:
+        return sum(w for i, w in enumerate(objective_weights) if (marking >> i) & 1)
+    
+    best = max(reachable_markings, key=value)
+    return (pn.marking_to_tuple(best), value(best))
+
+
 def optimize_reachable_markings_ilp(pn: PetriNet, 
                                     objective_weights: List[int],
                                     bdd_result: Tuple = None) -> Optional[Tuple[Tuple[int, ...], int]]:
@@ -733,10 +1271,21 @@ def optimize_reachable_markings_ilp(pn: PetriNet,
     - Variables: M_p ∈ {0,1} for each place p
     - Objective: maximize sum(c_p * M_p)
     - Constraints: M is reachable (checked via BDD membership)
+    
+    An optimum that the BDD rejects is excluded with a no-good cut and the
+    ILP is solved again, so the first reachable optimum is the answer.
+    
+    Raises:
+        CutLimitReached: if MAX_NO_GOOD_CUTS cuts did not reach an optimum
     """
     if not ILP_AVAILABLE:
         return None
     
+    # Without BDD verification, we can't guarantee reachability
+    is_reachable = reachability_oracle(pn, bdd_result)
+    if is_reachable is None:
+        return None
+    
     # Create ILP problem
     prob = pulp.LpProblem("OptimizeMarkings", pulp.LpMaximize)
     
@@ -748,40 +1297,48 @@ def optimize_reachable_markings_ilp(pn: PetriNet,
     # Objective
     prob += sum(objective_weights[pn.place_to_index[pid]] * M[pid] for pid in pn.place_ids)
     
-    # Solve
-    prob.solve(pulp.PULP_CBC_CMD(msg=0))
+    # Every reachable marking satisfies the P-invariant equations
+    add_p_invariant_constraints(prob, pn, M)
     
-    if prob.status == pulp.LpStatusOptimal:
+    for cuts in range(MAX_NO_GOOD_CUTS + 1):
+        # Solve
+        prob.solve(ilp_solver())
+        if prob.status != pulp.LpStatusOptimal:
+            return None
+        
         marking_list = []
         for pid in pn.place_ids:
             val = M[pid].varValue
-            marking_list.append(int(val) if val is not None else 0)
+            marking_list.append(int(round(val)) if val is not None else 0)
         marking = tuple(marking_list)
         value = sum(objective_weights[i] * marking[i] for i in range(len(marking)))
         
         # Verify reachability
-        if bdd_result is not None and BDD_AVAILABLE:
-            bdd, bdd_manager, current_vars = bdd_result
-            if is_marking_reachable_bdd(bdd_manager, bdd, marking, current_vars, pn):
-                return (marking, value)
-        else:
-            # Without BDD verification, we can't guarantee reachability
-            return None
-    
-    return None
+        if is_reachable(marking):
+            return (marking, value)
+        
+        if cuts == MAX_NO_GOOD_CUTS:
+            raise CutLimitReached()
+        
+        # Unreachable: cut it off and look for the next best marking
+        add_no_good_cut(prob, pn, M, marking)
 
 
-def main():
-    """Main function to run all tasks."""
-    import sys
-    
-    if len(sys.argv) < 2:
-        print("Usage: python petri_net_analyzer.py <pnml_file> [objective_weights]")
-        print("Example: python petri_net_analyzer.py test_net.xml 1,2,3")
-        sys.exit(1)
+def analyze(pnml_file: str, weights: Optional[str] = None) -> bool:
+    """
+    Run all five tasks on a PNML file, printing each task's report.
     
-    pnml_file = sys.argv[1]
+    This is the importable counterpart of the command line, for callers that
+    analyze many files in one interpreter.
     
+    Args:
+        pnml_file: Path to the PNML file
+        weights: Optional comma-separated objective weights (e.g. "1,2,3");
+            defaults to maximizing the total number of tokens
+        
+    Returns:
+        False if the file could not be parsed, True otherwise
+    """
     # Task 1: Parse PNML
     print("=" * 60)
     print("TASK 1: PNML PARSING")
@@ -790,7 +1347,7 @@ def main():
         pn = parse_pnml(pnml_file)
     except Exception as e:
         print(f"\tError parsing PNML: {e}")
-        sys.exit(1)
+        return False
     
     # Task 2: Explicit reachability
     reachable_markings = explicit_reachability(pn)
@@ -802,10 +1359,10 @@ def main():
     deadlock = deadlock_detection(pn, reachable_markings, bdd_result)
     
     # Task 5: Optimization
-    if len(sys.argv) >= 3:
+    if weights is not None:
         try:
-            weights = [int(w.strip()) for w in sys.argv[2].split(',')]
-            optimize_reachable_markings(pn, weights, reachable_markings, bdd_result)
+            objective_weights = [int(w.strip()) for w in weights.split(',')]
+            optimize_reachable_markings(pn, objective_weights, reachable_markings, bdd_result)
         except ValueError as e:
             print(f"\tInvalid objective weights: {e}")
     else:
@@ -816,6 +1373,18 @@ def main():
     print("\n" + "=" * 60)
     print("ALL TASKS COMPLETED")
     print("=" * 60)
+    return True
+
+
+def main():
+    """Main function to run all tasks."""
+    if len(sys.argv) < 2:
+        print("Usage: python petri_net_analyzer.py <pnml_file> [objective_weights]")
+        print("Example: python petri_net_analyzer.py test_net.xml 1,2,3")
+        sys.exit(1)
+    
+    if not analyze(sys.argv[1], sys.argv[2] if len(sys.argv) >= 3 else None):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
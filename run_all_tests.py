@@ -4,21 +4,132 @@ Script to run all test cases for Petri Net Analyzer
 Automatically finds all .xml test files and runs the analyzer on each one.
 """
 
+import argparse
+import contextlib
+import hashlib
+import importlib.metadata
+import io
+import json
 import os
+import selectors
+import signal
 import sys
 import subprocess
-import glob
-from datetime import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
-def print_separator(char='=', length=80):
+# Format of the start and finish timestamps
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Interpreter and analyzer script for subprocess runs, resolved once
+PYEXE = sys.executable
+ANALYZER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "petri_net_analyzer.py")
+
+# Analyzer module for in-process runs, imported once per worker process
+analyzer = None
+
+# Results of passing tests, one JSON file per cache key (see cache_key)
+CACHE_DIR = os.path.join(".cache", "run_all_tests")
+
+# In-memory layer over CACHE_DIR for repeated runs in one process:
+# test_file -> (cache key, (success, report)). An entry whose key no longer
+# matches the file is replaced, which evicts results of edited files
+_session_results = {}
+
+class TestTimeout(BaseException):
+    """
+    Raised inside an in-process test that exceeds its time limit
+    
+    Derived from BaseException so that the analyzer's own "except Exception"
+    handlers cannot catch the alarm and carry on without a time limit.
+    """
+
+def _load_analyzer():
+    """Import the analyzer module (worker initializer for --in-process runs)"""
+    global analyzer
+    import petri_net_analyzer
+    analyzer = petri_net_analyzer
+
+def _raise_timeout(signum, frame):
+    """SIGALRM handler that aborts the running in-process test"""
+    raise TestTimeout()
+
+def print_separator(char='=', length=80, file=None):
     """Print a separator line"""
-    print(char * length)
+    print(char * length, file=file)
 
-def print_header(text):
+def print_header(text, file=None):
     """Print a formatted header"""
-    print_separator()
-    print(f" {text}")
-    print_separator()
+    print_separator(file=file)
+    print(f" {text}", file=file)
+    print_separator(file=file)
+
+def write_block(buffer):
+    """Write everything printed into a StringIO to stdout in a single call"""
+    sys.stdout.write(buffer.getvalue())
+    sys.stdout.flush()
+
+def run_analyzer(cmd, timeout):
+    """
+    Run an analyzer command, reading its output as it is produced
+    
+    Both pipes are drained in 64 KiB chunks as data arrives, so the child
+    never blocks on a full pipe and nothing is decoded until it exits.
+    
+    Args:
+        cmd: Command line to run
+        timeout: Seconds to wait before killing the command
+    
+    Returns:
+        Tuple (returncode, stdout, stderr) with the output as bytes
+    
+    Raises:
+        subprocess.TimeoutExpired: if the command ran out of time
+    """
+    # close_fds=False lets CPython start the child with posix_spawn rather
+    # than fork + exec, and skips closing every descriptor in the child.
+    # Python creates descriptors non-inheritable (PEP 446), so the child
+    # still only receives its standard streams, even when other threads
+    # have their own pipes open
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0,
+                            close_fds=False)
+    if os.name == "nt":
+        # Windows cannot select() on pipes
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            raise
+        return proc.returncode, stdout, stderr
+    
+    stdout, stderr = bytearray(), bytearray()
+    buffers = {proc.stdout.fileno(): stdout, proc.stderr.fileno(): stderr}
+    deadline = time.monotonic() + timeout
+    try:
+        with selectors.DefaultSelector() as selector:
+            for fd in buffers:
+                selector.register(fd, selectors.EVENT_READ)
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+                for key, _ in selector.select(remaining):
+                    chunk = os.read(key.fd, 65536)
+                    if chunk:
+                        buffers[key.fd] += chunk
+                    else:
+                        selector.unregister(key.fd)  # end of stream
+        returncode = proc.wait(timeout=max(0.0, deadline - time.monotonic()))
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        proc.stdout.close()
+        proc.stderr.close()
+    
+    return returncode, bytes(stdout), bytes(stderr)
 
 def run_test(test_file, weights=None):
     """
@@ -27,91 +138,304 @@ def run_test(test_file, weights=None):
     Args:
         test_file: Path to the test XML file
         weights: Optional weight string (e.g., "1,2,3")
+    
+    Returns:
+        Tuple (success, report) where report is the test's full output block,
+        so tests running in parallel can be printed without interleaving
     """
-    print_header(f"Running: {test_file}")
+    out = io.StringIO()
+    print_header(f"Running: {test_file}", file=out)
     
     # Build command
-    cmd = [sys.executable, "petri_net_analyzer.py", test_file]
+    cmd = [PYEXE, ANALYZER, test_file]
     if weights:
         cmd.append(weights)
     
     # Run the analyzer
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=60  # 60 second timeout
-        )
+        returncode, stdout, stderr = run_analyzer(cmd, timeout=60)  # 60 second timeout
+        # Decode once; stray invalid bytes must not turn a run into an error
+        stdout = stdout.decode("utf-8", errors="replace")
+        stderr = stderr.decode("utf-8", errors="replace")
         
         # Print output
-        print(result.stdout)
+        print(stdout, file=out)
         
-        if result.stderr:
-            print("STDERR:", result.stderr)
+        if stderr:
+            print("STDERR:", stderr, file=out)
         
-        if result.returncode != 0:
-            print(f"	Test failed with return code: {result.returncode}")
-            return False
+        if returncode != 0:
+            print(f"	Test failed with return code: {returncode}", file=out)
+            success = False
         else:
-            print(f"	Test completed successfully")
-            return True
-            
+            print(f"	Test completed successfully", file=out)
+            success = True
+    
     except subprocess.TimeoutExpired:
-        print(f"	Test timed out after 60 seconds")
-        return False
+        print(f"	Test timed out after 60 seconds", file=out)
+        success = False
+    except Exception as e:
+        print(f"	Error running test: {e}", file=out)
+        success = False
+    
+    return success, out.getvalue()
+
+def run_test_in_process(test_file, weights=None):
+    """
+    Run a single test case by calling the analyzer in this interpreter
+    
+    Same contract as run_test, but without starting a new Python process:
+    the analyzer's output is captured by redirecting stdout and stderr, and
+    the 60 second limit is enforced with SIGALRM where the platform has it.
+    Must run in the main thread of its process.
+    """
+    if analyzer is None:
+        _load_analyzer()
+    
+    out = io.StringIO()
+    print_header(f"Running: {test_file}", file=out)
+    stdout, stderr = io.StringIO(), io.StringIO()
+    
+    use_alarm = hasattr(signal, "SIGALRM")
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.alarm(60)  # 60 second timeout
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            parsed = analyzer.analyze(test_file, weights)
+        
+        # Print output
+        print(stdout.getvalue(), file=out)
+        
+        if stderr.getvalue():
+            print("STDERR:", stderr.getvalue(), file=out)
+        
+        if not parsed:
+            print(f"	Test failed: the analyzer could not parse the file", file=out)
+            success = False
+        else:
+            print(f"	Test completed successfully", file=out)
+            success = True
+    
+    except TestTimeout:
+        print(f"	Test timed out after 60 seconds", file=out)
+        success = False
     except Exception as e:
-        print(f"	Error running test: {e}")
-        return False
+        print(f"	Error running test: {e}", file=out)
+        success = False
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, previous_handler)
+    
+    return success, out.getvalue()
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of a file's contents"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def package_version(name):
+    """Return an installed package's version, or "none" if it is missing"""
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return "none"
+
+def toolchain_digest(in_process):
+    """
+    Digest everything besides the test file that a test's result depends on
+    
+    Covers the analyzer and runner sources, the interpreter, the dd and pulp
+    versions (dd decides the BDD backend) and the run mode, so upgrading or
+    switching any of them invalidates cached results.
+    """
+    parts = [file_digest(ANALYZER), file_digest(os.path.abspath(__file__)), sys.version,
+             package_version("dd"), package_version("pulp"),
+             "in-process" if in_process else "subprocess"]
+    return hashlib.sha256(":".join(parts).encode()).hexdigest()
+
+def cache_key(test_file, weights, toolchain):
+    """
+    Key a test's result on everything that determines it
+    
+    The key covers the test file's contents, the weights and the toolchain
+    digest (see toolchain_digest), so editing the input, the analyzer or the
+    runner, or changing the environment, invalidates it.
+    """
+    return hashlib.sha256(
+        f"{file_digest(test_file)}:{weights or ''}:{toolchain}".encode()
+    ).hexdigest()
+
+def load_cached_result(key):
+    """Return the cached (success, report) for a key, or None on a miss"""
+    try:
+        with open(os.path.join(CACHE_DIR, key + ".json"), encoding="utf-8") as f:
+            entry = json.load(f)
+        return entry["success"], entry["report"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def store_cached_result(key, success, report):
+    """Save a test's (success, report) under a key"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, key + ".json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"success": success, "report": report}, f)
+    os.replace(path + ".tmp", path)  # never leave a half-written entry
 
-def main():
+def run_tests(test_files, jobs, in_process=False, use_cache=True):
+    """
+    Run test cases, yielding (test_file, success, report) as each finishes
+    
+    Passing results are cached on disk (see cache_key), and in memory for
+    later calls in the same process, and reused for unchanged inputs;
+    failed and timed-out tests always run again.
+    
+    Args:
+        test_files: Paths to the test XML files
+        jobs: Number of tests to run at once
+        in_process: Call the analyzer in-process instead of as a subprocess
+        use_cache: Reuse and record results in CACHE_DIR
+    """
+    if not use_cache:
+        yield from _execute_tests(test_files, jobs, in_process)
+        return
+    
+    toolchain = toolchain_digest(in_process)
+    keys = {}
+    pending = []
+    for test_file in test_files:
+        key = keys[test_file] = cache_key(test_file, None, toolchain)
+        session_entry = _session_results.get(test_file)
+        if session_entry is not None and session_entry[0] == key:
+            cached = session_entry[1]
+        else:
+            cached = load_cached_result(key)
+            if cached is not None:
+                _session_results[test_file] = (key, cached)
+        if cached is None:
+            pending.append(test_file)
+        else:
+            success, report = cached
+            yield test_file, success, report + "	(result reused from cache)\n"
+    
+    for test_file, success, report in _execute_tests(pending, jobs, in_process):
+        if success:
+            store_cached_result(keys[test_file], success, report)
+            _session_results[test_file] = (keys[test_file], (success, report))
+        yield test_file, success, report
+
+def _execute_tests(test_files, jobs, in_process):
+    """Run test cases without the cache, yielding results as each finishes"""
+    if not test_files:
+        return
+    
+    if in_process and jobs == 1:
+        # Nothing runs concurrently, so call the analyzer right here: no
+        # worker process, no pickling of reports back to the parent
+        for test_file in test_files:
+            yield (test_file,) + run_test_in_process(test_file)
+        return
+    
+    if in_process:
+        # A persistent pool: each worker imports the analyzer once and then
+        # runs test after test, saving an interpreter start per test
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=_load_analyzer)
+        test_runner = run_test_in_process
+    else:
+        # run_test only waits on its subprocess (with the GIL released), so
+        # threads give the same parallelism as worker processes without
+        # starting and pickling to an extra interpreter per worker
+        executor = ThreadPoolExecutor(max_workers=jobs)
+        test_runner = run_test
+    
+    with executor:
+        futures = {executor.submit(test_runner, test_file): test_file for test_file in test_files}
+        for future in as_completed(futures):
+            yield (futures[future],) + future.result()
+
+def main(argv=None):
     """Main function to run all tests"""
-    print_header(f"PETRI NET ANALYZER - TEST SUITE")
-    print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print()
+    parser = argparse.ArgumentParser(
+        description="Run the Petri net analyzer on every .xml file in the current directory")
+    parser.add_argument(
+        "--in-process", action="store_true",
+        help="run tests in long-lived worker processes that import the analyzer "
+             "once, instead of starting a new interpreter per test")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1,
+        help="number of tests to run at once (default: CPU count); with "
+             "--in-process, 1 runs every test in this process")
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help=f"rerun every test instead of reusing results cached in {CACHE_DIR}")
+    args = parser.parse_args(argv)
     
-    # Find all XML test files
-    test_files = sorted(glob.glob("*.xml"))
+    # Output is assembled in memory and written a block at a time (banner,
+    # each test report, summary) instead of one write per print() call
+    out = io.StringIO()
+    print_header(f"PETRI NET ANALYZER - TEST SUITE", file=out)
+    print(f"Started at: {time.strftime(TIMESTAMP_FORMAT)}", file=out)
+    print(file=out)
+    
+    # Find all XML test files (hidden files skipped, as "*.xml" globbing did);
+    # scandir entries carry their file type, so no stat per name is needed
+    entries = [entry for entry in os.scandir(".")
+               if entry.name.endswith(".xml") and not entry.name.startswith(".")
+               and entry.is_file()]
+    test_files = sorted(entry.name for entry in entries)
     
     if not test_files:
-        print("	No test files found in current directory")
+        print("	No test files found in current directory", file=out)
+        write_block(out)
         return 1
     
-    print(f"Found {len(test_files)} test file(s):")
+    print(f"Found {len(test_files)} test file(s):", file=out)
     for i, test_file in enumerate(test_files, 1):
-        print(f"  {i}. {test_file}")
-    print()
+        print(f"  {i}. {test_file}", file=out)
+    print(file=out)
+    write_block(out)
     
-    # Track results
-    results = {}
+    # Track results as (test_file, success), in test file order whatever
+    # order the tests finish in
+    position = {test_file: i for i, test_file in enumerate(test_files)}
+    results = [None] * len(test_files)
     
-    # Run each test
-    for test_file in test_files:
-        success = run_test(test_file)
-        results[test_file] = success
-        print()  # Empty line between tests
+    # Run the tests in parallel, printing each report as a whole once its
+    # test finishes
+    # Largest files are started first, so a big net that sorts late cannot
+    # end up running alone after all the others have finished
+    schedule = [entry.name for entry in sorted(entries, key=lambda e: e.stat().st_size, reverse=True)]
+    jobs = max(1, min(len(test_files), args.jobs))
+    for test_file, success, report in run_tests(schedule, jobs, args.in_process,
+                                                use_cache=not args.no_cache):
+        results[position[test_file]] = (test_file, success)
+        sys.stdout.write(report + "\n")  # Empty line between tests
+        sys.stdout.flush()
     
     # Print summary
-    print_separator('=', 80)
-    print(" TEST SUMMARY")
-    print_separator('=', 80)
+    out = io.StringIO()
+    print_separator('=', 80, file=out)
+    print(" TEST SUMMARY", file=out)
+    print_separator('=', 80, file=out)
     
-    passed = sum(1 for success in results.values() if success)
+    passed = sum(success for _, success in results)
     failed = len(results) - passed
     
-    print(f"\nTotal Tests: {len(results)}")
-    print(f"	Passed: {passed}")
-    print(f"	Failed: {failed}")
-    print()
+    print(f"\nTotal Tests: {len(results)}", file=out)
+    print(f"	Passed: {passed}", file=out)
+    print(f"	Failed: {failed}", file=out)
+    print(file=out)
     
     # List results
-    for test_file, success in results.items():
-        status = "	PASS" if success else "	FAIL"
-        print(f"  {status} - {test_file}")
+    out.write("".join(f"  {'	PASS' if success else '	FAIL'} - {test_file}\n"
+                      for test_file, success in results))
     
-    print()
-    print(f"Finished at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print_separator('=', 80)
+    print(file=out)
+    print(f"Finished at: {time.strftime(TIMESTAMP_FORMAT)}", file=out)
+    print_separator('=', 80, file=out)
+    write_block(out)
     
     # Return exit code
     return 0 if failed == 0 else 1